@@ -1,12 +1,13 @@
-import json, uuid
+import os, time, hashlib
 import streamlit as st
 import streamlit.components.v1 as components
-import pandas as pd
-from io import StringIO
 import modules.graphs as graphs
 import modules.formats as formats
 import modules.charts as charts
 import modules.animated as animated
+import modules.hierarchy as hierarchy
+import modules.cache as cache
+import modules.frames as frames
 import modules.utils as utils
 import modules.auth as auth
 
@@ -15,95 +16,219 @@ st.title("Hierarchical Data Viewer")
 st.caption("Display your hierarchical data with charts and graphs.")
 auth.check_user_and_password()
 
-def getSessionId():
-    if "session_id" not in st.session_state:
-        st.session_state["session_id"] = str(uuid.uuid4())
-    return st.session_state["session_id"]
+# parsed datasets shared by all sessions, by content hash, w/ an upper memory bound
+@st.cache_resource
+def getDatasets():
+    return cache.LruCache(maxEntries=16, maxBytes=1024 * 1024 * 1024,
+        getSize=lambda df: int(df.memory_usage(deep=True).sum()))
 
-@st.cache_data(show_spinner="Loading the CSV file...")
-def loadFile(session_id, filename):
-    return pd.read_csv(filename).convert_dtypes()
+def loadFile(key, file):
+    # parsed only once per content, then memory-mapped from disk, even after a restart
+    def make():
+        with st.spinner("Loading the CSV file..."):
+            return frames.getFrame(key, lambda: utils.readCsv(file))
+
+    # the session keeps a reference to its own dataset, even once evicted
+    df = getDatasets().get(key, make)
+    st.session_state["dataset"] = df
+    return df
+
+# keyed by dataset content and columns, as Streamlit hashes only a sample of large frames
+@st.cache_resource(show_spinner="Building the hierarchy...", max_entries=10)
+def getHierarchy(_df, key, child, parent, forest=False):
+    return hierarchy.Hierarchy(_df, forest)
+
+# serialized formats, shared by all sessions and keyed by data content
+@st.cache_resource
+def getFormatCache():
+    return cache.LruCache(maxEntries=32, maxBytes=256 * 1024 * 1024,
+        getSize=lambda doc: len(doc[0]) + doc[1].nbytes)
+
+# UTF-8 document w/ its line offsets
+def getFormat(tree, sel):
+    def make():
+        data = formats.getText(tree, sel).encode("utf-8")
+        return data, formats.getLines(data)
+    return getFormatCache().get((tree.key, sel), make)
+
+# show one page of lines at a time, and download the full document
+def showFormat(tree, sel, language, extension, pageSize=1000):
+    data, lines = getFormat(tree, sel)
+    st.download_button(f"Download {sel}", data,
+        file_name=f"hierarchy.{extension}", mime="text/plain")
+
+    start = 0
+    if len(lines) > pageSize:
+        pages = (len(lines) - 1) // pageSize + 1
+        page = st.number_input(f"Page (of {pages}):",
+            min_value=1, max_value=pages, value=1, key=f"page-{sel}")
+        start = (page - 1) * pageSize
+        st.caption(f"Lines {start + 1:,} to {min(start + pageSize, len(lines)):,} of {len(lines):,}")
+    st.code(formats.getPage(data, lines, start, pageSize),
+        language=language, line_numbers=True)
+
+# interactive JSON of the whole tree when small, else of its top levels only,
+# as one large st.json message freezes the browser
+def showJsonTree(tree, maxBytes=1024 * 1024, levels=3):
+    data, _ = getFormat(tree, "JSON")
+    if len(data) <= maxBytes:
+        st.json(data.decode("utf-8"))
+        return
+
+    st.download_button("Download JSON", data,
+        file_name="hierarchy.json", mime="text/plain")
+    def make():
+        top = formats.getJsonText(formats.getJsonChunks(tree, levels)[0]).encode("utf-8")
+        return top, formats.getLines(top)
+    top, _ = getFormatCache().get((tree.key, "JSON Tree", levels), make)
+    if len(top) <= maxBytes:
+        st.caption(f"Only the top {levels} levels are shown, w/ deeper subtrees as \"_chunk\". "
+            "Download the JSON document for the whole tree.")
+        st.json(top.decode("utf-8"))
+    else:
+        st.warning("This tree is too large to show here. Download the JSON document instead.")
+
+# collapsed graph laid out on the server, cached per data content and settings
+# (failures raise, so they are not cached, and are tried again on the next rerun)
+@st.cache_data(show_spinner="Laying out the graph...", max_entries=20)
+def getGraphSvg(_tree, key, maxDepth, maxChildren):
+    svg = graphs.getSvg(graphs.getCollapsed(_tree, maxDepth, maxChildren))
+    if svg is None: raise RuntimeError("Graphviz layout failed")
+    return svg
 
 with st.sidebar:
     uploaded_file = st.file_uploader(
         "Upload a CSV file", type=["csv"], accept_multiple_files=False)
     
+    # parse uploads straight from their bytes, cached by content hash
+    # (hashed once per upload, from a memoryview w/o copying the bytes)
     filename = utils.getFullPath("data/employees.csv")
+    key = f"{filename}:{os.path.getmtime(filename)}"
     if uploaded_file is not None:
-        filename = StringIO(uploaded_file.getvalue().decode("utf-8"))
+        hashes = st.session_state.setdefault("upload_hashes", {})
+        if uploaded_file.file_id not in hashes:
+            hashes[uploaded_file.file_id] = hashlib.sha1(uploaded_file.getbuffer()).hexdigest()
+        key = hashes[uploaded_file.file_id]
+        uploaded_file.seek(0)
+        filename = uploaded_file
 
-    df_orig = loadFile(getSessionId(), filename)
+    df_orig = loadFile(key, filename)
     cols = list(df_orig.columns)
 
     child = st.selectbox("Child Column Name", cols, index=0)
     parent = st.selectbox("Parent Column Name", cols, index=1)
     df = df_orig[[child, parent]]
+    tree = getHierarchy(df, key, child, parent)
+
+    # bad data fails fast here, before any view is rendered
+    issues = tree.getIssues()
+    if len(issues["cycles"]) > 0:
+        cycle = issues["cycles"][0]
+        st.error(f"{len(issues['cycles']):,} cycles found, as in: "
+            + " → ".join(str(tree.names[i]) for i in cycle + cycle[:1])
+            + f" ({issues['unreachable']:,} nodes not reachable from a root)")
+        st.stop()
+    if len(issues["orphans"]) > 0:
+        st.warning(f"{len(issues['orphans']):,} nodes w/ a parent not found, kept as roots: "
+            + ", ".join(str(tree.names[i]) for i in issues["orphans"][:5]))
+    if len(issues["roots"]) > 1:
+        if st.toggle(f"Show all {len(issues['roots']):,} roots", value=True):
+            tree = getHierarchy(df, key, child, parent, forest=True)
+
+    with st.expander("Dataset cache"):
+        stats = getDatasets().getStats()
+        st.caption(f"{stats['entries']} datasets, {stats['bytes'] / 1024 / 1024:,.1f} MB resident, "
+            f"{stats['hit_rate']:.0%} hit rate ({stats['hits']:,} hits, {stats['misses']:,} misses)")
+        count, size = frames.getStats()
+        st.caption(f"{count} datasets, {size / 1024 / 1024:,.1f} MB on disk")
 
-tabSource, tabFormat, tabGraph, tabChart, tabAnim = st.tabs(
-    ["Source", "Format", "Graph", "Chart", "Animated"])
+# only the selected view runs, unlike st.tabs which runs all of them
+view = st.radio("View:", ["Source", "Format", "Graph", "Chart", "Animated"],
+    horizontal=True, label_visibility="collapsed")
+start = time.perf_counter()
 
-with tabSource:
+if view == "Source":
     st.dataframe(df_orig, use_container_width=True)
 
 # show in another data format
-with tabFormat:
+elif view == "Format":
     sel = st.selectbox(
         "Select a data format:",
         ["JSON", "XML", "YAML", "JSON Path", "JSON Tree"])
 
-    root = formats.getJson(df)
     if sel == "JSON":
-        jsn = json.dumps(root, indent=2)
-        st.code(jsn, language="json", line_numbers=True)
+        showFormat(tree, sel, "json", "json")
     elif sel == "XML":
-        xml = formats.getXml(root)
-        st.code(xml, language="xml", line_numbers=True)
+        showFormat(tree, sel, "xml", "xml")
     elif sel == "YAML":
-        yaml = formats.getYaml(root)
-        st.code(yaml, language="yaml", line_numbers=True)
+        showFormat(tree, sel, "yaml", "yaml")
     elif sel == "JSON Path":
-        jsn = json.dumps(formats.getPath(root, []), indent=2)
-        st.code(jsn, language="json", line_numbers=True)
+        showFormat(tree, sel, "json", "json")
     elif sel == "JSON Tree":
-        st.json(root)
+        showJsonTree(tree)
 
-with tabGraph:
-    graph = graphs.getEdges(df)
-    url = graphs.getUrl(graph)
-    st.link_button("Visualize Online", url)
-    st.graphviz_chart(graph)
+elif view == "Graph":
+    large = st.toggle("Large graph mode", value=len(tree) > 2000)
+    if not large:
+        graph = graphs.getEdges(tree)
+        url = graphs.getOnlineUrl(tree)
+        if url is not None:
+            st.link_button("Visualize Online", url)
+        else:
+            st.download_button("Download DOT", graph,
+                file_name="hierarchy.dot", mime="text/plain",
+                help="Too large to open online, open the file in any Graphviz viewer.")
+        st.graphviz_chart(graph)
+    else:
+        col1, col2 = st.columns(2)
+        maxDepth = col1.slider("Max depth:", 1, 20, 4)
+        maxChildren = col2.slider("Max children per node:", 1, 100, 20)
+        try: svg = getGraphSvg(tree, tree.key, maxDepth, maxChildren)
+        except RuntimeError: svg = None
+        if svg is None:
+            st.warning("Graphviz is not installed locally, or failed on this graph, the browser will lay out the collapsed graph.")
+            st.graphviz_chart(graphs.getCollapsed(tree, maxDepth, maxChildren))
+        else:
+            components.html(svg, height=2200, scrolling=True)
 
 # show as Plotly chart
-with tabChart:
-    labels = df[df.columns[0]]
-    parents = df[df.columns[1]]
-
-    sel = st.selectbox(
+elif view == "Chart":
+    col1, col2 = st.columns(2)
+    sel = col1.selectbox(
         "Select a chart type:",
-        ["Treemap", "Icicle", "Sunburst", "Sankey"])
-    if sel == "Treemap":
-        fig = charts.makeTreemap(labels, parents)
-    elif sel == "Icicle":
-        fig = charts.makeIcicle(labels, parents)
-    elif sel == "Sunburst":
-        fig = charts.makeSunburst(labels, parents)
-    elif sel == "Sankey":
-        fig = charts.makeSankey(labels, parents)
+        ["Treemap", "Icicle", "Sunburst", "Sankey", "Sankey (by Subtree Size)"])
+    maxDepth = col2.number_input("Max depth (0 for all levels):",
+        min_value=0, value=0 if len(tree) <= 10000 else 4)
+    maxDepth = None if maxDepth == 0 else maxDepth
+
+    if sel.startswith("Sankey"): maxDepth = None
+    fig = charts.getFigure(tree, sel, maxDepth)
     st.plotly_chart(fig, use_container_width=True)
 
 # show as D3 animated chart
-with tabAnim:
+elif view == "Animated":
     sel = st.selectbox(
         "Select a D3 chart type:",
-        ["Collapsible Tree", "Linear Dendrogram", "Radial Dendrogram", "Network Graph"])
+        ["Collapsible Tree", "Collapsible Tree (Progressive)",
+        "Linear Dendrogram", "Radial Dendrogram", "Network Graph"])
     if sel == "Collapsible Tree":
-        filename = animated.makeCollapsibleTree(df)
+        html = animated.getCollapsibleTree(tree)
+    elif sel == "Collapsible Tree (Progressive)":
+        levels = st.slider("Levels loaded at once:", 1, 10, 3)
+        html = animated.getProgressiveTree(tree, levels)
     elif sel == "Linear Dendrogram":
-        filename = animated.makeLinearDendrogram(df)
+        html = animated.getLinearDendrogram(tree)
     elif sel == "Radial Dendrogram":
-        filename = animated.makeRadialDendrogram(df)
+        html = animated.getRadialDendrogram(tree)
     elif sel == "Network Graph":
-        filename = animated.makeNetworkGraph(df)
+        layout = st.radio("Layout:", ["Physics", "Tree", "Radial"], horizontal=True,
+            index=0 if len(tree) <= 1000 else 1)
+        html = animated.getNetworkGraph(tree, None if layout == "Physics" else layout.lower())
+    components.html(html, height=2200, width=1000)
 
-    with open(filename, 'r', encoding='utf-8') as f:
-        components.html(f.read(), height=2200, width=1000)
+# cost of this view, vs. the other views as last measured in this session
+timings = st.session_state.setdefault("timings", {})
+timings[view] = time.perf_counter() - start
+saved = sum(t for v, t in timings.items() if v != view)
+st.caption(f"{view} rendered in {timings[view] * 1000:,.0f} ms, "
+    f"{saved * 1000:,.0f} ms saved by not running the other views.")
@@ -0,0 +1,137 @@
+# compare the modules against their original row-by-row implementations
+# run from the current subfolder: python benchmark.py [rows ...]
+import sys, os, time, json, tempfile
+import numpy as np
+import pandas as pd
+import modules.formats as formats
+import modules.animated as animated
+import modules.graphs as graphs
+import modules.hierarchy as hierarchy
+import modules.utils as utils
+
+def makeFrame(rows):
+    # random tree: each node hangs under one of the nodes created before it
+    rng = np.random.default_rng(0)
+    ids = np.arange(rows)
+    parents = rng.integers(0, ids[1:])
+    names = pd.Series([f"N{i}" for i in ids], dtype="string")
+    return pd.DataFrame({
+        "child": names,
+        "parent": pd.concat([pd.Series([pd.NA], dtype="string"),
+            names.iloc[parents].reset_index(drop=True)], ignore_index=True)})
+
+def timeit(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+# original formats.getJson, w/ two iterrows passes
+def getJsonRows(df):
+    nodes = {}
+    for _, row in df.iterrows():
+        name = row.iloc[0]
+        nodes[name] = { "name": name }
+
+    root = None
+    for _, row in df.iterrows():
+        node = nodes[row.iloc[0]]
+        isRoot = pd.isna(row.iloc[1])
+        if isRoot: root = node
+        else:
+            parent = nodes[row.iloc[1]]
+            if "children" not in parent: parent["children"] = []
+            parent["children"].append(node)
+    return root
+
+# original formats.getPath, recursive over the nested JSON
+def getPathRows(node, nodes, path=""):
+    path += node["name"] if len(path) == 0 else f'.{node["name"]}'
+    nodes.append({ "id": path })
+    if "children" in node:
+        for child in node["children"]:
+            nodes = getPathRows(child, nodes, path)
+    return nodes
+
+def benchJson(df):
+    old, t0 = timeit(getJsonRows, df)
+    new, t1 = timeit(formats.getJson, df)
+    assert old == new
+    print(f"getJson     {len(df):>9,} rows: iterrows {t0:8.3f}s  numpy {t1:8.3f}s  x{t0 / t1:.1f}")
+
+# JSON array embedded in the radial dendrogram, from the prebuilt hierarchy
+def benchPath(df):
+    tree = hierarchy.Hierarchy(df)
+    old, t0 = timeit(lambda: getPathRows(tree.getJson(), []))
+    new, t1 = timeit(formats.getPath, tree)
+    assert old == new
+    _, t2 = timeit(lambda: json.dumps(new, indent=2))
+    print(f"getPath     {len(df):>9,} rows: recursive {t0:7.3f}s  arrays {t1:8.3f}s  x{t0 / t1:.1f}  (+{t2:.3f}s json.dumps)")
+
+# original graphs.getEdges, w/ iterrows and one string per edge
+def getEdgesRows(df):
+    edges = ""
+    for _, row in df.iterrows():
+        isRoot = pd.isna(row.iloc[1])
+        if not isRoot:
+            edges += f'\t"{row.iloc[0]}" -> "{row.iloc[1]}";\n'
+    return f"digraph {{\n{edges}}}\n"
+
+def benchEdges(df):
+    tree = hierarchy.Hierarchy(df)
+    old, t0 = timeit(getEdgesRows, df)
+    new, t1 = timeit(graphs.getEdges, tree)
+    assert old == new
+    _, t2 = timeit(lambda: graphs.getEdges(tree, nodes=True))
+    edges = len(df) - 1
+    print(f"getEdges    {len(df):>9,} rows: iterrows {t0:8.3f}s  numpy {t1:8.3f}s  x{t0 / t1:.1f}"
+        f"  ({edges / t1:,.0f} edges/s, {edges / t2:,.0f} edges/s w/ node IDs)")
+
+# original animated.makeNetworkGraph nodes and edges, w/ pyvis add_node/add_edge
+def getNetworkRows(df):
+    from pyvis.network import Network
+    data = Network(notebook=True, heading='')
+    for _, row in df.iterrows():
+        src = str(row.iloc[0])
+        dst = str(row.iloc[1])
+        data.add_node(src)
+        data.add_node(dst)
+        data.add_edge(src, dst)
+    map = data.get_adj_list()
+    for node in data.nodes:
+        node["value"] = len(map[node["id"]])
+    return data
+
+# pyvis checks for duplicates linearly, so skip it on large frames
+def benchNetwork(df, maxRows=20_000):
+    tree = hierarchy.Hierarchy(df)
+    new, t1 = timeit(animated._makeNetwork, tree)
+    if len(df) > maxRows:
+        print(f"network     {len(df):>9,} rows: pyvis    (skipped)  numpy {t1:8.3f}s")
+        return
+    old, t0 = timeit(getNetworkRows, df)
+    assert len(old.nodes) == len(new.nodes) + 1  # w/o the "<NA>" parent of the root
+    print(f"network     {len(df):>9,} rows: pyvis    {t0:8.3f}s  numpy {t1:8.3f}s  x{t0 / t1:.1f}")
+
+# parse time and frame memory of the CSV loaders, w/ a few more columns than child/parent
+def benchCsv(df):
+    extra = df.assign(id=np.arange(len(df)), salary=np.arange(len(df)) * 10.0, job="ENGINEER")
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "tree.csv")
+        extra.to_csv(filename, index=False)
+
+        old, t0 = timeit(lambda: pd.read_csv(filename).convert_dtypes())
+        new, t1 = timeit(utils.readCsv, filename)
+        cols, t2 = timeit(utils.readCsv, filename, ["child", "parent"])
+    mb = lambda df: df.memory_usage(deep=True).sum() / 1024 / 1024
+    print(f"readCsv     {len(df):>9,} rows: pandas   {t0:8.3f}s  arrow {t1:8.3f}s  x{t0 / t1:.1f}"
+        f"  ({mb(old):,.1f} MB vs {mb(new):,.1f} MB, {t2:.3f}s and {mb(cols):,.1f} MB w/ 2 columns)")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 100_000, 1_000_000]
+    for rows in sizes:
+        df = makeFrame(rows)
+        benchJson(df)
+        benchPath(df)
+        benchEdges(df)
+        benchNetwork(df)
+        benchCsv(df)
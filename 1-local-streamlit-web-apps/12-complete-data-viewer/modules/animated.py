@@ -1,45 +1,116 @@
 from pyvis.network import Network
-import os, json
+import os
+import numpy as np
+import pandas as pd
 import modules.formats as formats
+import modules.hierarchy as hierarchy
+import modules.store as store
+import modules.cache as cache
 import modules.utils as utils
 
-def makeCollapsibleTree(df):
-    return _makeTree("collapsible-tree", df)
+# all templates read once at import, split around their data placeholder
+def _loadTemplates():
+    folder = utils.getFullPath("animated/templates")
+    templates = {}
+    for name in os.listdir(folder):
+        if name.endswith(".html"):
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as file:
+                templates[name[:-5]] = file.read().split('"{{data}}"', 1)
+    return templates
 
-def makeLinearDendrogram(df):
-    return _makeTree("linear-dendrogram", df)
+templates = _loadTemplates()
 
-def makeCircularPacking(df):
-    return _makeTree("circular-packing", df)
+# HTML from template customized with our compact JSON
+def renderTemplate(template, data):
+    before, after = templates[template]
+    return before + formats.getJsonText(data) + after
 
-def _makeTree(template, df):
+def getCollapsibleTree(tree):
+    return renderTemplate("collapsible-tree", formats.getJson(tree))
 
-    root = formats.getJson(df)
+def getLinearDendrogram(tree):
+    return renderTemplate("linear-dendrogram", formats.getJson(tree))
 
-    # create HTML file from template customized with our JSON
-    with open(utils.getFullPath(f"animated/templates/{template}.html"), "r") as file:
-        content = file.read()
-        
-    filename = utils.getFullPath(f'animated/{template}.html')
-    with open(filename, "w") as file:
-        file.write(content.replace('"{{data}}"', json.dumps(root, indent=4)))
-    return os.path.abspath(filename)
+def getCircularPacking(tree):
+    return renderTemplate("circular-packing", formats.getJson(tree))
 
-def makeRadialDendrogram(df):
+# static/chunks/<hash>-<group>.json, served by Streamlit as app/static/chunks/...
+chunkFolder = utils.getFullPath("static/chunks")
+chunkFiles = 64
+pages = cache.LruCache(maxEntries=16, maxBytes=128 * 1024 * 1024,
+    getSize=lambda page: len(page[0]))
 
-    path = formats.getPath(formats.getJson(df), [])
+# collapsible tree w/ only the top levels embedded, and deeper subtrees fetched on expand
+def getProgressiveTree(tree, levels=3, url="app/static/chunks/"):
+    tree = hierarchy.get(tree)
+    prefix = store.getKey(tree.key, str(levels), str(chunkFiles))[:20]
 
-    # create HTML file from template customized with our JSON array
-    with open(utils.getFullPath("animated/templates/radial-dendrogram.html"), "r") as file:
-        content = file.read()
-    content = content.replace('"{{data}}"', json.dumps(path, indent=2))
+    def make():
+        # all chunks below the same top-level subtree saved together, in a few files only
+        top = np.arange(len(tree))
+        for level in tree.getLevels()[2:]:
+            top[level] = top[tree.parent[level]]
+        root, chunks = formats.getJsonChunks(tree, levels, top % chunkFiles)
 
-    filename = utils.getFullPath("animated/radial-dendrogram.html")
-    with open(filename, "w") as file:
-        file.write(content)
-    return filename
+        files = {}
+        for key, children in chunks.items():
+            files.setdefault(key.split("/")[0], {})[key] = children
+        for group, content in files.items():
+            store.getFile(chunkFolder, f"{prefix}-{group}.json",
+                lambda: formats.getJsonText(content))
+        probe = os.path.join(chunkFolder, f"{prefix}-{next(iter(files))}.json") if files else None
+        return renderTemplate("collapsible-tree-chunked",
+            { "url": f"{url}{prefix}-", "tree": root }), probe
 
-def makeNetworkGraph(df):
+    # make it again when its chunks have been evicted from the static folder
+    key = (tree.key, levels, url)
+    html, probe = pages.get(key, make)
+    if probe is not None and not os.path.exists(probe):
+        pages.put(key, make())
+        html, probe = pages.get(key)
+    return html
+
+def getRadialDendrogram(tree):
+    return renderTemplate("radial-dendrogram", formats.getPath(tree))
+
+def getNetworkGraph(tree, layout=None):
+    return _makeNetwork(tree, layout).generate_html(notebook=True)
+
+# node positions per data content hash and layout
+layouts = cache.LruCache(maxEntries=32, maxBytes=256 * 1024 * 1024,
+    getSize=lambda xy: xy[0].nbytes + xy[1].nbytes)
+
+# (x, y) of each node, leaves spread evenly and parents centered above their leaves
+def getPositions(tree, radial=False, spacing=50, levelSpacing=150):
+
+    def make():
+        # leaves under each node, and the first leaf slot of each node's subtree
+        leaves = tree.getTotals((tree.offsets[1:] == tree.offsets[:-1]).astype(np.int64))
+        counts = leaves[tree.children]
+        firsts = np.repeat(tree.offsets[:-1], np.diff(tree.offsets))
+        before = np.cumsum(counts) - counts
+        slot = np.zeros(len(tree), dtype=np.int64)
+        slot[tree.children] = before - before[firsts]
+        start = np.zeros(len(tree), dtype=np.int64)
+        levels = tree.getLevels()
+        if len(levels) > 0:
+            roots = levels[0]
+            start[roots] = np.cumsum(leaves[roots]) - leaves[roots]
+        for level in levels[1:]:
+            start[level] = start[tree.parent[level]] + slot[level]
+
+        # each node centered above its leaves, one row per level
+        x = (start + leaves / 2) * spacing
+        y = np.maximum(tree.depth, 0) * levelSpacing
+        if radial:
+            angle = 2 * np.pi * x / max(leaves[tree.getRoots()].sum() * spacing, 1)
+            x, y = y * np.cos(angle), y * np.sin(angle)
+        return x, y
+
+    tree = hierarchy.get(tree)
+    return layouts.get((tree.key, radial, spacing, levelSpacing), make)
+
+def _makeNetwork(tree, layout=None):
 
     data = Network(notebook=True, heading='')
     data.barnes_hut(
@@ -50,20 +121,33 @@ def makeNetworkGraph(df):
         damping=0.09,
         overlap=0)
 
-    for _, row in df.iterrows():
-        src = str(row.iloc[0])
-        dst = str(row.iloc[1])
-        data.add_node(src)
-        data.add_node(dst)
-        data.add_edge(src, dst)
-
-    # set node size to number of child nodes
-    map = data.get_adj_list()
-    for node in data.nodes:
-        node["value"] = len(map[node["id"]])
-
-    filename = utils.getFullPath("animated/network-graph.html")
-    try: os.remove(filename)
-    except OSError: pass
-    data.show(filename)
-    return os.path.abspath(filename)
+    # dedupe node labels and undirected edges w/ numpy, instead of pyvis' linear checks
+    tree = hierarchy.get(tree)
+    codes, labels = pd.factorize(pd.Series(tree.names, dtype=object).astype(str))
+    ids, parents = tree.getEdges()
+    src, dst = codes[ids], codes[parents]
+    _, first = np.unique(np.minimum(src, dst) * len(labels) + np.maximum(src, dst),
+        return_index=True)
+    first.sort()
+    src, dst = src[first], dst[first]
+
+    # set node size to number of connected nodes
+    degree = np.bincount(np.concatenate((src, dst)), minlength=len(labels))
+
+    # vis.js nodes and edges, as pyvis add_node and add_edge would make them
+    labels = labels.tolist()
+    data.nodes = [{ "color": "#97c2fc", "id": label, "label": label, "shape": "dot", "value": value }
+        for label, value in zip(labels, degree.tolist())]
+    data.edges = [{ "from": labels[s], "to": labels[d] }
+        for s, d in zip(src.tolist(), dst.tolist())]
+    data.node_ids = labels
+    data.node_map = dict(zip(labels, data.nodes))
+
+    # fixed positions computed once, so the browser needs no physics simulation
+    if layout is not None:
+        x, y = getPositions(tree, radial=layout == "radial")
+        _, first = np.unique(codes, return_index=True)
+        for node, nx, ny in zip(data.nodes, x[first].tolist(), y[first].tolist()):
+            node["x"], node["y"] = nx, ny
+        data.toggle_physics(False)
+    return data
@@ -1,52 +1,100 @@
-import pandas as pd
+import json
+import numpy as np
 import plotly.graph_objects as go
+import modules.hierarchy as hierarchy
+import modules.cache as cache
+
+# serialized figures per data content hash, chart type and options
+figures = cache.LruCache(maxEntries=32, maxBytes=256 * 1024 * 1024)
+
+def makeChart(tree, chart, maxDepth=None):
+    if chart == "Treemap":
+        return makeTreemap(tree, maxDepth)
+    elif chart == "Icicle":
+        return makeIcicle(tree, maxDepth)
+    elif chart == "Sunburst":
+        return makeSunburst(tree, maxDepth)
+    elif chart == "Sankey":
+        return makeSankey(tree)
+    elif chart == "Sankey (by Subtree Size)":
+        return makeSankey(tree, aggregate=True)
+    raise ValueError(f"Unknown chart type: {chart}")
+
+# cached figure, rebuilt from its JSON w/o validating it again
+def getFigure(tree, chart, maxDepth=None):
+    tree = hierarchy.get(tree)
+    spec = figures.get((tree.key, chart, maxDepth),
+        lambda: makeChart(tree, chart, maxDepth).to_json())
+    return go.Figure(json.loads(spec), _validate=False)
+
+# ids/labels/parents w/ precomputed subtree sizes, down to maxDepth levels when set
+def getNodes(tree, maxDepth=None, values=None):
+
+    tree = hierarchy.get(tree)
+    totals = (tree.getSizes() if values is None
+        else tree.getTotals(np.asarray(values, dtype=float)))
+    ids = np.flatnonzero(tree.depth >= 0 if maxDepth is None
+        else (tree.depth >= 0) & (tree.depth <= maxDepth))
+
+    names = tree.names
+    return dict(
+        ids=[names[i] for i in ids],
+        labels=[names[i] for i in ids],
+        parents=["" if p < 0 else names[p] for p in tree.parent[ids].tolist()],
+        values=totals[ids],
+        branchvalues="total")
 
 # see https://plotly.com/python/treemaps/
-def makeTreemap(labels, parents):
+def makeTreemap(tree, maxDepth=None):
 
     data = go.Treemap(
-        ids=labels,
-        labels=labels,
-        parents=parents,
+        **getNodes(tree, maxDepth),
         root_color="lightgrey")
     fig = go.Figure(data)
     #fig.write_html(utils.getFullPath('charts/treemap.html'))
     return fig
 
 # see https://plotly.com/python/icicle-charts/
-def makeIcicle(labels, parents):
+def makeIcicle(tree, maxDepth=None):
 
     data = go.Icicle(
-        ids=labels,
-        labels=labels,
-        parents=parents,
+        **getNodes(tree, maxDepth),
         root_color="lightgrey")
     fig = go.Figure(data)
     #fig.write_html(utils.getFullPath('charts/icicle.html'))
     return fig
 
 # see https://plotly.com/python/sunburst-charts/
-def makeSunburst(labels, parents):
+def makeSunburst(tree, maxDepth=None):
 
     data = go.Sunburst(
-        ids=labels,
-        labels=labels,
-        parents=parents,
+        **getNodes(tree, maxDepth),
         insidetextorientation='horizontal')
     fig = go.Figure(data)
     #fig.write_html(utils.getFullPath('charts/sunburst.html'))
     return fig
 
 # see https://plotly.com/python/sankey-diagram/
-def makeSankey(labels, parents):
+def makeSankey(tree, aggregate=False):
+
+    # node ids are the factorized names, so links need no label lookups
+    tree = hierarchy.get(tree)
+    if not aggregate:
+        source = np.arange(len(tree))
+        target = tree.parent
+        value = list(range(1, len(tree)))
+    else:
+        # one link per non-root node, as thick as its whole subtree
+        source, target = tree.getEdges()
+        value = tree.getSizes()[source]
 
     data = go.Sankey(
-        node=dict(label=labels),
+        node=dict(label=tree.names),
         link=dict(
-            source=[list(labels).index(x) for x in labels],
-            target=[-1 if pd.isna(x) else list(labels).index(x) for x in parents],
-            label=labels,
-            value=list(range(1, len(labels)))))
+            source=source,
+            target=target,
+            label=[tree.names[i] for i in source],
+            value=value))
     fig = go.Figure(data)
     #fig.write_html(utils.getFullPath('charts/sankey.html'))
     return fig
@@ -1,8 +1,76 @@
-import pandas as pd
+import json
+import numpy as np
+import modules.hierarchy as hierarchy
 
 indent = '  '
 
-def getJson(df):
+# serialized text of a whole hierarchy, in one of the Format tab formats
+def getText(tree, format):
+    if format == "JSON":
+        return getJsonText(getJson(tree), indent=2)
+    elif format == "XML":
+        return getXml(getJson(tree))
+    elif format == "YAML":
+        return getYaml(getJson(tree))
+    elif format == "JSON Path":
+        return json.dumps(getPath(tree), indent=2)
+    raise ValueError(f"Unknown format: {format}")
+
+# same text as json.dumps, even for trees nested deeper than the recursion limit
+def getJsonText(data, indent=None):
+    try:
+        if indent is None:
+            return json.dumps(data, separators=(",", ":"))
+        return json.dumps(data, indent=indent)
+    except RecursionError:
+        return "".join(iterJson(data, indent))
+
+def iterJson(data, indent=None):
+    colon = ":" if indent is None else ": "
+
+    # explicit stack of values to write and text already made
+    stack = [(False, data, 0)]
+    while len(stack) > 0:
+        isText, value, level = stack.pop()
+        if isText:
+            yield value
+            continue
+
+        if isinstance(value, dict):
+            items, brackets = list(value.items()), "{}"
+        elif isinstance(value, (list, tuple)):
+            items, brackets = list(enumerate(value)), "[]"
+        else:
+            yield json.dumps(value)
+            continue
+        if len(items) == 0:
+            yield brackets
+            continue
+
+        # push the items in reverse, each after its separator, newline and key
+        newline = "" if indent is None else "\n" + " " * (indent * (level + 1))
+        yield brackets[0]
+        stack.append((True, ("" if indent is None else "\n" + " " * (indent * level)) + brackets[1], 0))
+        for i in reversed(range(len(items))):
+            key, item = items[i]
+            prefix = ("," if i > 0 else "") + newline
+            if brackets == "{}": prefix += json.dumps(key) + colon
+            stack.append((False, item, level + 1))
+            stack.append((True, prefix, 0))
+
+# byte offsets where each line starts, to page through large UTF-8 documents
+def getLines(data):
+    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n")) + 1
+    return np.concatenate(([0], ends[ends < len(data)]))
+
+# text of lines [start, start+count), decoded from the UTF-8 document only
+def getPage(data, lines, start, count):
+    end = start + count
+    first = lines[start]
+    last = lines[end] if end < len(lines) else len(data)
+    return data[first:last].decode("utf-8")
+
+def getJson(tree):
     """
     { "name": "KING",
       "children": [{
@@ -15,26 +83,25 @@ def getJson(df):
     }
     """
 
-    # collect all nodes
-    nodes = {}
-    for _, row in df.iterrows():
-        name = row.iloc[0]
-        nodes[name] = { "name": name }
-
-    # move children under parents, and detect root
-    root = None
-    for _, row in df.iterrows():
-        node = nodes[row.iloc[0]]
-        isRoot = pd.isna(row.iloc[1])
-        if isRoot: root = node
-        else:
-            parent = nodes[row.iloc[1]]
-            if "children" not in parent: parent["children"] = []
-            parent["children"].append(node)
+    return hierarchy.get(tree).getJson()
+
+def getJsonChunks(tree, levels, groups=None):
+    """
+    { "name": "KING",
+      "children": [{
+         "name": "BLAKE",
+         "_chunk": "7"
+      }, ...]
+    },
+    { "7": [{ "name": "ALLEN" }, { "name": "JAMES" }, ...], ... }
+    """
+
+    return hierarchy.get(tree).getChunks(levels, groups)
 
-    return root
+def getXml(node):
+    return "".join(iterXml(node))
 
-def getXml(node, level=0):
+def iterXml(node):
     """
     <object>
       <name>KING</name>
@@ -51,25 +118,33 @@ def getXml(node, level=0):
     ...
     """
 
-    # add <object> and <name>
-    indent0 = indent * level
-    indent1 = indent0 + indent
-
-    s = '<?xml version="1.0" encoding="utf-8"?>\n' if level == 0 else ''
-    s += f"{indent0}<object>\n"
-    s += f"{indent1}<name>{node['name']}</name>\n"
-
-    # recursively append the inner children
-    if "children" in node:
-        s += f"{indent1}<children>\n"
-        for child in node["children"]:
-            s += getXml(child, level+2)
-        s += f"{indent1}</children>\n"
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+
+    # explicit stack of nodes to open and closing tags still to emit
+    stack = [(node, 0)]
+    while len(stack) > 0:
+        node, level = stack.pop()
+        if isinstance(node, str):
+            yield node
+            continue
+
+        # add <object> and <name>
+        indent0 = indent * level
+        indent1 = indent0 + indent
+        yield f"{indent0}<object>\n{indent1}<name>{node['name']}</name>\n"
+
+        # push the inner children in reverse, so the first one is popped first
+        if "children" in node:
+            yield f"{indent1}<children>\n"
+            stack.append((f"{indent1}</children>\n{indent0}</object>\n", level))
+            stack.extend((child, level+2) for child in reversed(node["children"]))
+        else:
+            yield f"{indent0}</object>\n"
 
-    s += f"{indent0}</object>\n"
-    return s
+def getYaml(node):
+    return "".join(iterYaml(node))
 
-def getYaml(node, level=0, first=False):
+def iterYaml(node):
     """
     KING
     - BLAKE
@@ -79,22 +154,24 @@ def getYaml(node, level=0, first=False):
     ...
     """
 
-    indent0 = indent * level
-    indent1 = indent0 + '  '
-
-    s = f"{node['name']}\n"
+    # explicit stack of (node, level, line prefix)
+    stack = [(node, 0, "")]
+    while len(stack) > 0:
+        node, level, prefix = stack.pop()
+        yield f"{prefix}{node['name']}\n"
 
-    # recursively append the inner children
-    if "children" in node:
-        first = True
-        for child in node["children"]:
-            s += f"{indent0}- " if first else indent1
-            s += getYaml(child, level+1, first)
-            first = False
+        # first child starts a new list, the others are aligned below it
+        if "children" in node:
+            indent0 = indent * level
+            indent1 = indent0 + '  '
+            children = node["children"]
+            stack.extend((child, level+1, indent1) for child in reversed(children[1:]))
+            stack.append((children[0], level+1, f"{indent0}- "))
 
-    return s
+def getPath(tree):
+    return list(iterPath(tree))
 
-def getPath(node, nodes, path=""):
+def iterPath(tree):
     """
     [{ "id": "KING.JONES.SCOTT.ADAMS" },
     { "id": "KING.BLAKE.ALLEN" },
@@ -103,11 +180,21 @@ def getPath(node, nodes, path=""):
     ...]
     """
 
-    # append full path to the top of the current node
-    path += node["name"] if len(path) == 0 else f'.{node["name"]}'
-    nodes.append({ "id": path })
-
-    if "children" in node:
-        for child in node["children"]:
-            nodes = getPath(child, nodes, path)
-    return nodes
+    tree = hierarchy.get(tree)
+    root = tree.getRoot()
+    if root is None: return
+    names = [str(name) for name in tree.names]
+    offsets, children = tree.offsets.tolist(), tree.children.tolist()
+
+    # depth-first from the root, each path extends its parent's path once
+    # (in forest mode, from all roots below the extra top node, as in the nested JSON)
+    if tree.forest:
+        yield { "id": hierarchy.forestName }
+        stack = [(r, f"{hierarchy.forestName}.{names[r]}") for r in reversed(tree.getRoots().tolist())]
+    else:
+        stack = [(root, names[root])]
+    while len(stack) > 0:
+        node, path = stack.pop()
+        yield { "id": path }
+        start, end = offsets[node], offsets[node + 1]
+        stack.extend((c, f"{path}.{names[c]}") for c in reversed(children[start:end]))
@@ -0,0 +1,47 @@
+import os
+import pandas as pd
+import modules.store as store
+import modules.utils as utils
+
+# cache/frames/<content hash>.arrow, kept across server restarts, w/ its own disk budget
+# and no age limit, as hot datasets are served from memory and never touch their file
+folder = utils.getFullPath("cache/frames")
+maxBytes = 2 * 1024 * 1024 * 1024
+
+# parsed DataFrame (CSV upload, query result...) saved once per key as an Arrow IPC file,
+# then memory-mapped on each hit, w/o parsing or unpickling it again
+def getFrame(key, make):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return make()
+
+    made = []
+    def save():
+        made.append(make())
+        table = pa.Table.from_pandas(made[0])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+
+    # the frame itself when its file cannot be written or read, or was evicted meanwhile
+    try:
+        filename = store.getFile(folder, f"{store.getKey(key)}.arrow", save,
+            budget=maxBytes, age=0)
+        return readFrame(filename)
+    except OSError:
+        return made[0] if len(made) > 0 else make()
+
+# zero-copy: the Arrow-backed columns point straight into the mapped file
+def readFrame(filename):
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map(filename)).read_all()
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+# number and total size of the saved frames
+def getStats():
+    if not os.path.isdir(folder): return 0, 0
+    sizes = [entry.stat().st_size for entry in os.scandir(folder)
+        if entry.is_file() and entry.name.endswith(".arrow")]
+    return len(sizes), sum(sizes)
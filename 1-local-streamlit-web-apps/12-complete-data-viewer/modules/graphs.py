@@ -1,17 +1,165 @@
-import urllib.parse
+import urllib.parse, shutil, subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+import modules.hierarchy as hierarchy
+import modules.cache as cache
+
+# longest URL most browsers and servers accept
+maxUrlLength = 8000
+
+# DOT punctuation left as is in URL query values
+urlSafe = "/:;=,@!$'()*"
 
 # get URL to Graphviz Visual Editor, w/ custom graph
 def getUrl(dot):
-    return f'http://magjac.com/graphviz-visual-editor/?dot={urllib.parse.quote(dot)}'
+    return f'http://magjac.com/graphviz-visual-editor/?dot={urllib.parse.quote(dot, safe=urlSafe)}'
+
+# encoded URLs per graph content hash
+urls = cache.LruCache(maxEntries=64, maxBytes=64 * 1024 * 1024)
+
+# URL to the full graph, else to its minified DOT when shorter, or None when both are too long
+def getOnlineUrl(tree, maxLength=maxUrlLength):
+    tree = hierarchy.get(tree)
+
+    def make():
+        url = getUrl(getEdges(tree))
+        if len(url) > maxLength:
+            url = min(url, getUrl(getMinified(tree)), key=len)
+        return url if len(url) <= maxLength else None
+    return urls.get((tree.key, maxLength), make)
+
+# DOT keywords, never used as bare IDs
+keywords = ["node", "edge", "graph", "digraph", "subgraph", "strict"]
+
+# digraph{n0[label="Steven King"];KING;BLAKE->KING;n0->BLAKE;...}
+def getMinified(tree):
+    tree = hierarchy.get(tree)
+
+    # names as bare IDs when valid (and never like a short ID), else quoted
+    names = pd.Series(tree.names, dtype=object).astype(str)
+    bare = (names.str.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*")
+        & ~names.str.fullmatch(r"n[0-9]+") & ~names.str.lower().isin(keywords))
+    refs = names.where(bare, getLabels(tree.names))
+
+    # a short ID w/ a label only where it makes the encoded URL shorter, for all the edges
+    ids, parents = tree.getEdges()
+    uses = np.bincount(np.concatenate((ids, parents)), minlength=len(tree))
+    keys = "n" + pd.Series(range(len(tree)), dtype=object).astype(str)
+    decls = keys + "[label=" + refs + "]"
+    size = lambda texts: texts.map(lambda text: len(urllib.parse.quote(text, safe=urlSafe))).to_numpy()
+    refSize, keySize = size(refs), size(keys)
+    declare = size(decls) + 1 + keySize * uses < refSize * uses
+    refs = refs.where(~declare, keys).to_numpy()
+
+    # declared nodes, nodes w/o any edge, then all edges
+    stmts = decls[declare].tolist() + refs[(uses == 0) & ~declare].tolist()
+    stmts += (refs[ids] + "->" + refs[parents]).tolist()
+    return f"digraph{{{';'.join(stmts)}}}"
+
+# quoted DOT IDs, escaped once per unique name
+def getLabels(names):
+    labels = pd.Series(names, dtype=object).astype(str)
+    return '"' + labels.str.replace('\\', '\\\\').str.replace('"', '\\"') + '"'
+
+# [shape="box", color="red"]
+def getAttributes(attrs):
+    return ", ".join(f'{name}="{value}"' for name, value in attrs.items())
 
 # digraph with edges only
-def getEdges(df):
-    
-    edges = ""
-    for _, row in df.iterrows():
-        isRoot = pd.isna(row.iloc[1])
-        if not isRoot:
-            edges += f'\t"{row.iloc[0]}" -> "{row.iloc[1]}";\n'
-    
-    return f"digraph {{\n{edges}}}\n"
+def getEdges(tree, nodes=False, attributes=None, nodeAttributes=None):
+    """
+    digraph {
+        "ALLEN" -> "BLAKE";
+        ...
+    }
+    w/ nodes=True, each node is declared once w/ a short ID and its label:
+    digraph {
+        n0 [label="ALLEN"];
+        ...
+        n0 -> n1;
+        ...
+    }
+    attributes: default attributes per statement, as in { "node": { "shape": "box" } }
+    nodeAttributes: attribute values per node ID, as in { "color": ["red", ...] } (w/ nodes=True)
+    """
+
+    tree = hierarchy.get(tree)
+    labels = getLabels(tree.names)
+    ids, parents = tree.getEdges()
+
+    lines = []
+    if attributes is not None:
+        lines += [f'\t{stmt} [{getAttributes(attrs)}];\n'
+            for stmt, attrs in attributes.items()]
+
+    if nodes:
+        # node IDs from the Hierarchy, and one label table for all edges
+        keys = "n" + pd.Series(range(len(labels)), dtype=object).astype(str)
+        attrs = "label=" + labels
+        for name, values in (nodeAttributes or {}).items():
+            attrs += f', {name}="' + pd.Series(values, dtype=object).astype(str).to_numpy() + '"'
+        lines += ("\t" + keys + " [" + attrs + "];\n").tolist()
+    else:
+        keys = labels
+
+    # all non-root edges at once, joined in a single pass
+    keys = keys.to_numpy()
+    lines += ("\t" + keys[ids] + " -> " + keys[parents] + ";\n").tolist()
+    return f"digraph {{\n{''.join(lines)}}}\n"
+
+# digraph w/ subtrees beyond maxDepth or maxChildren collapsed into summary nodes
+def getCollapsed(tree, maxDepth=3, maxChildren=10):
+    """
+    digraph {
+        n0 [label="KING"];
+        n1 [label="BLAKE"];
+        ...
+        s1 [label="+5 more", shape="box", style="dashed"];
+        n1 -> n0;
+        s1 -> n1;
+    }
+    """
+
+    # a node is shown if it is shallow enough, among its first siblings, and its parent is shown
+    tree = hierarchy.get(tree)
+    local = (tree.depth >= 0) & (tree.depth <= maxDepth) & (tree.getRanks() < maxChildren)
+    shown = np.zeros(len(tree), dtype=bool)
+    levels = tree.getLevels()
+    for d, level in enumerate(levels[:maxDepth + 1]):
+        shown[level] = local[level] & (True if d == 0 else shown[tree.parent[level]])
+
+    # hidden nodes directly under a shown parent are counted w/ their whole subtree
+    ids, parents = tree.getEdges()
+    cut = ~shown[ids] & shown[parents]
+    hidden = np.bincount(parents[cut], weights=tree.getSizes()[ids[cut]], minlength=len(tree))
+
+    labels = getLabels(tree.names).to_numpy()
+    keep = np.flatnonzero(shown)
+    summary = np.flatnonzero(hidden)
+    keys = "n" + pd.Series(keep, dtype=object).astype(str).to_numpy()
+    skeys = "s" + pd.Series(summary, dtype=object).astype(str).to_numpy()
+    edges = ids[shown[ids]]
+
+    lines = ("\t" + keys + " [label=" + labels[keep] + "];\n").tolist()
+    lines += [f'\t{key} [label="+{int(count):,} more", shape="box", style="dashed"];\n'
+        for key, count in zip(skeys, hidden[summary])]
+    lines += [f"\tn{c} -> n{p};\n" for c, p in zip(edges.tolist(), tree.parent[edges].tolist())]
+    lines += [f"\t{key} -> n{p};\n" for key, p in zip(skeys, summary.tolist())]
+    return f"digraph {{\n{''.join(lines)}}}\n"
+
+# one Graphviz process per worker thread, never more than a few at a time
+executor = ThreadPoolExecutor(max_workers=2)
+
+# lay out a graph w/ the local Graphviz binary, or None when not installed, failing or too slow
+def getSvg(dot, timeout=120):
+    exe = shutil.which("dot")
+    if exe is None: return None
+
+    def layout():
+        return subprocess.run([exe, "-Tsvg"], input=dot.encode("utf-8"),
+            capture_output=True, check=True, timeout=timeout).stdout.decode("utf-8")
+    try:
+        return executor.submit(layout).result()
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+        return None
@@ -0,0 +1,193 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+# name of the extra top node in forest mode
+forestName = "(all)"
+
+def getIds(df):
+    """
+    names:   ["Hermann Baer", "Shelley Higgins", "Steven King", ...]
+    parents: [3, 3, -1, ...]
+    orphans: [7, ...] (ids of nodes w/ a parent name not found, kept as roots)
+    """
+
+    # factorize child names to integer ids (in order of first appearance)
+    children = df[df.columns[0]]
+    parents = df[df.columns[1]]
+    ids, names = pd.factorize(children)
+    names = pd.Index(names)
+
+    # map each parent name to the id of its child row, w/ -1 for the root
+    isRoot = pd.isna(parents).to_numpy(dtype=bool)
+    pids = names.get_indexer(parents)
+
+    # one parent per node, the last row for a repeated child wins
+    parent = np.full(len(names), -1, dtype=np.int32)
+    parent[ids] = np.where(isRoot, -1, pids)
+    missing = np.zeros(len(names), dtype=bool)
+    missing[ids] = (pids < 0) & ~isRoot
+    return names.tolist(), parent, np.flatnonzero(missing)
+
+def getChildren(parent):
+    """
+    offsets:  [0, 0, 0, 3, ...]
+    children: [2, 5, 9, ...]
+    children of node i are children[offsets[i]:offsets[i+1]]
+    """
+
+    # stable sort keeps siblings in their original row order
+    nonRoot = np.flatnonzero(parent >= 0).astype(np.int32)
+    children = nonRoot[np.argsort(parent[nonRoot], kind="stable")]
+    counts = np.bincount(parent[nonRoot], minlength=len(parent))
+    offsets = np.zeros(len(parent) + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, children
+
+def getKey(df):
+    # content hash of the child/parent values, to key the caches across sessions
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha1(rows.tobytes()).hexdigest()
+
+def getDepths(parent, offsets, children):
+
+    # walk down one level at a time from the roots, w/ -1 for unreachable nodes
+    depth = np.full(len(parent), -1, dtype=np.int32)
+    level = np.flatnonzero(parent < 0)
+    d = 0
+    while len(level) > 0:
+        depth[level] = d
+        starts = offsets[level]
+        counts = offsets[level + 1] - starts
+        firsts = np.cumsum(counts) - counts
+        level = children[np.repeat(starts - firsts, counts) + np.arange(counts.sum())]
+        d += 1
+    return depth
+
+class Hierarchy:
+    """
+    Child/parent relationships of a DataFrame, built once and shared by all views.
+    names:    unique node names, indexed by node id
+    parent:   parent id of each node, -1 for a root
+    offsets:  children of node i are children[offsets[i]:offsets[i+1]]
+    depth:    0 for a root, -1 for a node not reachable from any root
+    orphans:  ids of the nodes w/ an unknown parent, kept as roots
+    forest:   True to render all roots below one extra top node, else only the last real root
+    key:      content hash of the child/parent columns (and of the forest mode)
+    """
+    __slots__ = ("names", "parent", "offsets", "children", "depth", "orphans", "forest", "key")
+
+    def __init__(self, df, forest=False):
+        self.names, self.parent, self.orphans = getIds(df)
+        self.offsets, self.children = getChildren(self.parent)
+        self.depth = getDepths(self.parent, self.offsets, self.children)
+        self.forest = forest and len(self.getRoots()) > 1
+        self.key = getKey(df) + ("-forest" if self.forest else "")
+
+    def __len__(self):
+        return len(self.names)
+
+    def getRoots(self):
+        return np.flatnonzero(self.parent < 0)
+
+    def getRoot(self):
+        # the last root row w/ no parent, or the last orphan when there is none, or None
+        roots = self.getRoots()
+        real = np.setdiff1d(roots, self.orphans)
+        if len(real) > 0: return int(real[-1])
+        return int(roots[-1]) if len(roots) > 0 else None
+
+    def getCycles(self):
+        # each cycle once, as node ids going up, found by walking up once from every
+        # node not reachable from a root (its ancestors always end in a cycle)
+        parent = self.parent.tolist()
+        walks = {}
+        cycles = []
+        for start in np.flatnonzero(self.depth < 0).tolist():
+            path = []
+            node = start
+            while node not in walks:
+                walks[node] = start
+                path.append(node)
+                node = parent[node]
+
+            # this walk closed a loop, and didn't only join an earlier one
+            if walks[node] == start:
+                cycles.append(path[path.index(node):])
+        return cycles
+
+    def getIssues(self):
+        """
+        { "roots": [2, 9], "orphans": [9], "cycles": [[4, 6]], "unreachable": 3 }
+        """
+
+        # all checks in linear time, before any rendering
+        roots = self.getRoots()
+        return {
+            "roots": roots.tolist() if len(roots) != 1 else [],
+            "orphans": self.orphans.tolist(),
+            "cycles": self.getCycles(),
+            "unreachable": int((self.depth < 0).sum()) }
+
+    def getEdges(self):
+        # (child ids, parent ids) of all non-root nodes
+        ids = np.flatnonzero(self.parent >= 0)
+        return ids, self.parent[ids]
+
+    def getLevels(self):
+        # node ids grouped by depth, from the roots down
+        order = np.argsort(self.depth, kind="stable")
+        bounds = np.searchsorted(self.depth[order], np.arange(self.depth.max() + 2))
+        return [order[bounds[d]:bounds[d + 1]] for d in range(len(bounds) - 1)]
+
+    def getTotals(self, values):
+        # subtree sums of per-node values, added bottom-up one level at a time
+        totals = np.array(values, copy=True)
+        for level in reversed(self.getLevels()[1:]):
+            np.add.at(totals, self.parent[level], totals[level])
+        return totals
+
+    def getSizes(self):
+        # number of nodes in each subtree
+        return self.getTotals(np.ones(len(self.parent), dtype=np.int64))
+
+    def getRanks(self):
+        # position of each node among its siblings
+        ranks = np.zeros(len(self.parent), dtype=np.int32)
+        ranks[self.children] = (np.arange(len(self.children))
+            - self.offsets[self.parent[self.children]])
+        return ranks
+
+    def getJson(self):
+        return self.getChunks()[0]
+
+    def getChunks(self, levels=None, groups=None):
+        # nested dicts, w/ the children below every levels-th level split into chunks by parent id
+        # (as "<group>/<parent id>" w/ a group number per node, to save chunks together)
+
+        # one dict per node, linked to its children w/o any recursion
+        nodes = [{ "name": name } for name in self.names]
+        offsets, children = self.offsets.tolist(), self.children.tolist()
+        depth = self.depth.tolist()
+        groups = groups.tolist() if groups is not None else None
+        chunks = {}
+        for i, node in enumerate(nodes):
+            start, end = offsets[i], offsets[i + 1]
+            if start < end:
+                inner = [nodes[c] for c in children[start:end]]
+                if levels is not None and depth[i] >= 0 and (depth[i] + 1) % levels == 0:
+                    key = str(i) if groups is None else f"{groups[i]}/{i}"
+                    node["_chunk"] = key
+                    chunks[key] = inner
+                else:
+                    node["children"] = inner
+
+        # the last root row is the root, as before, or one top node above all roots
+        if self.forest:
+            return { "name": forestName, "children": [nodes[r] for r in self.getRoots()] }, chunks
+        root = self.getRoot()
+        return (nodes[root] if root is not None else None), chunks
+
+def get(data, forest=False):
+    # accept either a prebuilt Hierarchy or a child/parent DataFrame
+    return data if isinstance(data, Hierarchy) else Hierarchy(data, forest)
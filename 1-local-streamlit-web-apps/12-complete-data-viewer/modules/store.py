@@ -0,0 +1,72 @@
+import os, time, hashlib, tempfile
+
+# files older than a day are evicted, then the oldest ones above the folder budget
+maxAge = 24 * 60 * 60
+maxBytes = 512 * 1024 * 1024
+evictEvery = 60
+lastEvicted = {}
+
+# content hash of some str/bytes parts
+def getKey(*parts):
+    sha = hashlib.sha1()
+    for part in parts:
+        sha.update(part.encode("utf-8") if isinstance(part, str) else part)
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+# path to the file named after its content key, made and written only once
+def getFile(folder, name, make, budget=None, age=None):
+    filename = os.path.join(folder, name)
+    if os.path.exists(filename):
+        # mark as recently used, for the age-based eviction
+        try: os.utime(filename)
+        except OSError: pass
+        return filename
+
+    os.makedirs(folder, exist_ok=True)
+    write(filename, make())
+    evict(folder, budget=budget, age=age, keep=filename)
+    return filename
+
+# write to a temp file in the same folder, then rename it over the target at once,
+# so readers never see a partial file and concurrent writers of the same key never collide
+def write(filename, content):
+    folder = os.path.dirname(filename)
+    mode = "w" if isinstance(content, str) else "wb"
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, mode, **({} if mode == "wb" else {"encoding": "utf-8"})) as file:
+            file.write(content)
+        os.replace(tmp, filename)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+# budget: max folder size in bytes, when other than the default maxBytes
+# age: max file age in seconds, when other than the default maxAge, w/ 0 for no age limit
+# keep: a file never evicted here, as the one just written
+def evict(folder, force=False, budget=None, age=None, keep=None):
+    if budget is None: budget = maxBytes
+    if age is None: age = maxAge
+    now = time.time()
+    if not force and now - lastEvicted.get(folder, 0) < evictEvery: return
+    lastEvicted[folder] = now
+
+    files = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and not entry.name.startswith(".tmp-"):
+            try: stat = entry.stat()
+            except OSError: continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    # oldest first
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in files:
+        if (age == 0 or now - mtime <= age) and total <= budget: break
+        if path == keep: continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError: pass
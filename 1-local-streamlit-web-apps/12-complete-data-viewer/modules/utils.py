@@ -1,7 +1,15 @@
 import os
+import pandas as pd
 
 def getFullPath(filename):
     crtdir = os.path.dirname(__file__)
     pardir = os.path.abspath(os.path.join(crtdir, os.pardir))
     return f"{pardir}/{filename}"
 
+# parse w/ the multithreaded pyarrow engine straight into Arrow-backed dtypes,
+# w/o a second convert_dtypes copy, and optionally only some of the columns
+def readCsv(filename, usecols=None):
+    try:
+        return pd.read_csv(filename, engine="pyarrow", dtype_backend="pyarrow", usecols=usecols)
+    except ImportError:
+        return pd.read_csv(filename, usecols=usecols).convert_dtypes()
@@ -1,42 +1,57 @@
-import json, uuid
+import json, hashlib
 import streamlit as st
 import streamlit.components.v1 as components
 import pandas as pd
-from io import StringIO
 import modules.graphs as graphs
 import modules.formats as formats
 import modules.charts as charts
 import modules.animated as animated
+import modules.cache as cache
 import modules.utils as utils
 
 st.set_page_config(layout="wide")
 st.title("Hierarchical Data Viewer")
 st.caption("Display your hierarchical data with charts and graphs.")
 
-def getSessionId():
-    if "session_id" not in st.session_state:
-        st.session_state["session_id"] = str(uuid.uuid4())
-    return st.session_state["session_id"]
+# parsed datasets shared by all sessions, by content hash, w/ an upper memory bound
+@st.cache_resource
+def getDatasets():
+    return cache.LruCache(maxEntries=16, maxBytes=1024 * 1024 * 1024,
+        getSize=lambda df: int(df.memory_usage(deep=True).sum()))
 
-@st.cache_data(show_spinner="Loading the CSV file...")
-def loadFile(session_id, filename):
-    return pd.read_csv(filename).convert_dtypes()
+def loadFile(key, file):
+    def make():
+        with st.spinner("Loading the CSV file..."):
+            return pd.read_csv(file).convert_dtypes()
+    return getDatasets().get(key, make)
 
 with st.sidebar:
     uploaded_file = st.file_uploader(
         "Upload a CSV file", type=["csv"], accept_multiple_files=False)
     
+    # uploads hashed once per file, from a memoryview w/o copying the bytes
     filename = utils.getFullPath("data/employees.csv")
+    key = filename
     if uploaded_file is not None:
-        filename = StringIO(uploaded_file.getvalue().decode("utf-8"))
-
-    df_orig = loadFile(getSessionId(), filename)
+        hashes = st.session_state.setdefault("upload_hashes", {})
+        if uploaded_file.file_id not in hashes:
+            hashes[uploaded_file.file_id] = hashlib.sha1(uploaded_file.getbuffer()).hexdigest()
+        key = hashes[uploaded_file.file_id]
+        uploaded_file.seek(0)
+        filename = uploaded_file
+
+    df_orig = loadFile(key, filename)
     cols = list(df_orig.columns)
 
     child = st.selectbox("Child Column Name", cols, index=0)
     parent = st.selectbox("Parent Column Name", cols, index=1)
     df = df_orig[[child, parent]]
 
+    with st.expander("Dataset cache"):
+        stats = getDatasets().getStats()
+        st.caption(f"{stats['entries']} datasets, {stats['bytes'] / 1024 / 1024:,.1f} MB resident, "
+            f"{stats['hit_rate']:.0%} hit rate ({stats['hits']:,} hits, {stats['misses']:,} misses)")
+
     #st.sidebar.markdown(f"User: {st.experimental_user.email}")
 
 tabSource, tabFormat, tabGraph, tabChart, tabAnim = st.tabs(
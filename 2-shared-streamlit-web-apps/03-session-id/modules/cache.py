@@ -0,0 +1,69 @@
+import sys, threading
+from collections import OrderedDict
+
+class LruCache:
+    """
+    Thread-safe LRU cache shared across reruns and sessions,
+    bounded by a number of entries and by an approximate size in bytes.
+    """
+
+    def __init__(self, maxEntries=32, maxBytes=256 * 1024 * 1024, getSize=sys.getsizeof):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.getSize = getSize
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key, make=None):
+        # return a cached value and mark it as recently used, or make and add it
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+            self.misses += 1
+        if make is None: return None
+
+        value = make()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        size = self.getSize(value)
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+
+            # values larger than the whole budget are returned but never kept
+            if size > self.maxBytes: return
+            self.entries[key] = (value, size)
+            self.bytes += size
+
+            # evict the least recently used entries
+            while len(self.entries) > self.maxEntries or self.bytes > self.maxBytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def getStats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0 }
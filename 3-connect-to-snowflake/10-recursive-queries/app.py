@@ -17,7 +17,7 @@ with st.sidebar:
     hasTable = tableName is not None and len(tableName) > 0
     if hasTable:
         session = utils.getSession()
-        df_orig = utils.getDataFrame(session, f"select * from {tableName}")
+        cols = utils.getColumns(session, tableName)
     else:
         filename = utils.getFullPath("data/employees.csv")
         uploaded_file = st.file_uploader(
@@ -25,10 +25,19 @@ with st.sidebar:
         if uploaded_file is not None:
             filename = StringIO(uploaded_file.getvalue().decode("utf-8"))
         df_orig = utils.loadFile(filename)
+        cols = list(df_orig.columns)
 
-    cols = list(df_orig.columns)
     child = st.selectbox("Child Column Name", cols, index=0)
     parent = st.selectbox("Parent Column Name", cols, index=1)
+
+    # transfer only the child/parent columns, unless all of them are shown
+    if hasTable:
+        if st.toggle("Load all columns", value=False):
+            df_orig = utils.getDataFrame(session, f"select * from {tableName}")
+            df_orig.columns = cols
+        else:
+            df_orig = utils.getDataFrame(session, f"select {child}, {parent} from {tableName}")
+            df_orig.columns = [child, parent]
     df = df_orig[[child, parent]]
 
 tabSource, tabPath, tabFormat, tabGraph, tabChart, tabAnim = st.tabs(
@@ -37,22 +46,51 @@ tabSource, tabPath, tabFormat, tabGraph, tabChart, tabAnim = st.tabs(
 with tabSource:
     st.dataframe(df_orig, use_container_width=True)
 
+# drop the transient table, and turn off the Materialize toggle
+def dropPathTable(session, tableName, child_index, parent_index):
+    utils.dropPathTable(session, tableName, child_index, parent_index)
+    st.session_state["materialize"] = False
+
 with tabPath:
     if not hasTable:
         st.warning("Select a table/view")
     else:
         child_index = cols.index(child) + 1
         parent_index = cols.index(parent) + 1
-        query = f"""
-select repeat('  ', level - 1) || ${child_index} as name,
-ltrim(sys_connect_by_path(${child_index}, '.'), '.') as path
-from {tableName}
-start with ${parent_index} is null
-connect by prior ${child_index} = ${parent_index}
-order by path;
-"""
         session = utils.getSession()
-        df_path = utils.getDataFrame(session, query)
+
+        # optionally run the recursive query only once, then page through its saved result
+        materialize = st.toggle("Materialize", value=False, key="materialize",
+            help="Save the query result into a transient table, instead of running it again on each change")
+        pathTable = None
+        if materialize:
+            col1, col2 = st.columns(2)
+            col2.button("Drop", on_click=dropPathTable,
+                args=(session, tableName, child_index, parent_index),
+                help="Drop the transient table, and stop materializing")
+            if col1.button("Refresh"):
+                utils.getPathTable.clear()
+                utils.getPathPage.clear()
+                try: utils.makePathTable(session, tableName, child_index, parent_index, replace=True)
+                except utils.SnowparkSQLException as e:
+                    st.error(f"Cannot refresh the transient table: {e}")
+            pathTable, rows = utils.getPathTable(session, tableName, child_index, parent_index)
+            if pathTable is None:
+                st.warning("Cannot create a transient table, running the query instead.")
+
+        if pathTable is not None:
+            pageSize = 1000
+            start = 0
+            if rows > pageSize:
+                pages = (rows - 1) // pageSize + 1
+                page = st.number_input(f"Page (of {pages}):",
+                    min_value=1, max_value=pages, value=1)
+                start = (page - 1) * pageSize
+                st.caption(f"Rows {start + 1:,} to {min(start + pageSize, rows):,} of {rows:,}")
+            df_path = utils.getPathPage(session, pathTable, start, pageSize)
+        else:
+            query = utils.getPathQuery(tableName, child_index, parent_index) + "order by path;"
+            df_path = utils.getDataFrame(session, query)
         st.dataframe(df_path, use_container_width=True)
 
 # show in another data format
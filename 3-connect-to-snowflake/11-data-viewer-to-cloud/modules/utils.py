@@ -1,7 +1,9 @@
-import os, configparser
+import os, configparser, hashlib
 from sys import platform
 import pandas as pd
 from snowflake.snowpark import Session
+from snowflake.snowpark.functions import col
+from snowflake.snowpark.exceptions import SnowparkSQLException
 import streamlit as st
 
 def isLocal():
@@ -16,6 +18,11 @@ def getFullPath(filename):
 def loadFile(filename):
     return pd.read_csv(filename).convert_dtypes()
 
+# column names only, w/o fetching any row
+@st.cache_data(show_spinner="Reading the table columns...")
+def getColumns(_session, tableName):
+    return _session.table(tableName).columns
+
 @st.cache_data(show_spinner="Running a Snowflake query...")
 def getDataFrame(_session, query):
     rows = _session.sql(query).collect()
@@ -58,3 +65,58 @@ def getRemoteSession():
         if session is not None:
             st.info("Connected to Snowflake.")
     return session
+
+# indented names and full paths of a hierarchy, w/ a recursive query
+def getPathQuery(tableName, child_index, parent_index):
+    return f"""
+select repeat('  ', level - 1) || ${child_index} as name,
+ltrim(sys_connect_by_path(${child_index}, '.'), '.') as path
+from {tableName}
+start with ${parent_index} is null
+connect by prior ${child_index} = ${parent_index}
+"""
+
+# transient table next to the source table, named after its name and column indexes
+def getPathTableName(tableName, child_index, parent_index):
+    key = hashlib.sha1(f"{tableName}|{child_index}|{parent_index}".encode("utf-8")).hexdigest()
+    schema = tableName.rsplit(".", 1)[0] + "." if "." in tableName else ""
+    return f"{schema}HIERARCHY_PATH_{key[:16].upper()}"
+
+# run the recursive query once into a transient table, sorted and numbered by path
+def makePathTable(session, tableName, child_index, parent_index, replace=False):
+    pathTable = getPathTableName(tableName, child_index, parent_index)
+    create = "create or replace" if replace else "create"
+    exists = "" if replace else "if not exists"
+    session.sql(f"""
+{create} transient table {exists} {pathTable}
+data_retention_time_in_days = 0 as
+select row_number() over (order by path) as pos, name, path
+from ({getPathQuery(tableName, child_index, parent_index)})
+order by pos
+""").collect()
+    return pathTable
+
+# drop the transient table, w/ its cached pages
+def dropPathTable(session, tableName, child_index, parent_index):
+    pathTable = getPathTableName(tableName, child_index, parent_index)
+    session.sql(f"drop table if exists {pathTable}").collect()
+    getPathTable.clear()
+    getPathPage.clear()
+
+# (transient table name, number of rows), or (None, 0) when it cannot be created
+@st.cache_data(show_spinner="Materializing the hierarchy...")
+def getPathTable(_session, tableName, child_index, parent_index):
+    try:
+        pathTable = makePathTable(_session, tableName, child_index, parent_index)
+        return pathTable, _session.table(pathTable).count()
+    except SnowparkSQLException:
+        return None, 0
+
+# rows [start, start+count) of a transient table, fetched in Arrow batches
+@st.cache_data(show_spinner="Loading the paths...", max_entries=100)
+def getPathPage(_session, pathTable, start, count):
+    return (_session.table(pathTable)
+        .filter((col("POS") > start) & (col("POS") <= start + count))
+        .sort(col("POS"))
+        .select(col("NAME"), col("PATH"))
+        .to_pandas())